@@ -1,24 +1,92 @@
+import asyncio
 import json
 import os
-import boto3
+import urllib.request
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from fastapi import FastAPI, HTTPException
-from mangum import Mangum
-from models import RegisterRequest, LoginRequest
+from fastapi.responses import ORJSONResponse
+from auth_models import RegisterRequest, LoginRequest
 from database import DynamoDBService
-import uuid
+from aws import SESSION, CONFIG, PREWARM_CONNECTIONS
+from jose import JWTError, jwt
 
-app = FastAPI()
 db = DynamoDBService()
-cognito_client = boto3.client('cognito-idp')
+USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
+CLIENT_ID = os.environ.get('COGNITO_CLIENT_ID')
+_cognito_client = None
+
+def get_cognito_client():
+    # Built on first use so the Cognito client stays off the import path
+    global _cognito_client
+    if _cognito_client is None:
+        _cognito_client = SESSION.client('cognito-idp', config=CONFIG)
+    return _cognito_client
+
+def cognito_issuer() -> str:
+    region = USER_POOL_ID.split('_')[0]
+    return f'https://cognito-idp.{region}.amazonaws.com/{USER_POOL_ID}'
+
+_jwks = None
+
+def get_jwks(refresh: bool = False) -> Dict:
+    # User pool signing keys, fetched once per execution environment and
+    # again on refresh after Cognito rotates them
+    global _jwks
+    if _jwks is None or refresh:
+        with urllib.request.urlopen(f'{cognito_issuer()}/.well-known/jwks.json', timeout=5) as response:
+            _jwks = json.load(response)
+    return _jwks
+
+def find_signing_key(jwks: Dict, token: str) -> Optional[Dict]:
+    kid = jwt.get_unverified_header(token).get('kid')
+    return next((key for key in jwks.get('keys', []) if key.get('kid') == kid), None)
+
+def warm_cognito():
+    # Best effort: builds the client, opens a pooled connection and loads the
+    # signing keys during init
+    try:
+        get_cognito_client().describe_user_pool(UserPoolId=USER_POOL_ID)
+    except Exception:
+        pass
+    try:
+        get_jwks()
+    except Exception:
+        pass
+
+if PREWARM_CONNECTIONS:
+    db.warm()
+    warm_cognito()
+
+_jwks_prefetch = None
+
+async def prefetch_jwks():
+    try:
+        await asyncio.to_thread(get_jwks)
+    except Exception:
+        # Retried on the first login
+        pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _jwks_prefetch
+    if not PREWARM_CONNECTIONS:
+        # Without prewarm, load the signing keys in the background while the
+        # first requests arrive
+        _jwks_prefetch = asyncio.create_task(prefetch_jwks())
+    yield
+    if _jwks_prefetch is not None:
+        _jwks_prefetch.cancel()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 @app.post("/auth/register")
 async def register(request: RegisterRequest):
+    cognito_client = get_cognito_client()
     try:
-        user_pool_id = os.environ.get('COGNITO_USER_POOL_ID')
-        
         # Create user in Cognito
         response = cognito_client.admin_create_user(
-            UserPoolId=user_pool_id,
+            UserPoolId=USER_POOL_ID,
             Username=request.email,
             UserAttributes=[
                 {'Name': 'email', 'Value': request.email},
@@ -30,7 +98,7 @@ async def register(request: RegisterRequest):
         
         # Set permanent password
         cognito_client.admin_set_user_password(
-            UserPoolId=user_pool_id,
+            UserPoolId=USER_POOL_ID,
             Username=request.email,
             Password=request.password,
             Permanent=True
@@ -49,13 +117,12 @@ async def register(request: RegisterRequest):
 
 @app.post("/auth/login")
 async def login(request: LoginRequest):
+    cognito_client = get_cognito_client()
     try:
-        user_pool_id = os.environ.get('COGNITO_USER_POOL_ID')
-        client_id = os.environ.get('COGNITO_CLIENT_ID')
-        
-        response = cognito_client.admin_initiate_auth(
-            UserPoolId=user_pool_id,
-            ClientId=client_id,
+        response = await asyncio.to_thread(
+            cognito_client.admin_initiate_auth,
+            UserPoolId=USER_POOL_ID,
+            ClientId=CLIENT_ID,
             AuthFlow='ADMIN_NO_SRP_AUTH',
             AuthParameters={
                 'USERNAME': request.email,
@@ -66,9 +133,25 @@ async def login(request: LoginRequest):
         access_token = response['AuthenticationResult']['AccessToken']
         id_token = response['AuthenticationResult']['IdToken']
         
-        # Get user info from token
-        user_info = cognito_client.get_user(AccessToken=access_token)
-        user_id = user_info['Username']
+        # Get user info from the verified ID token
+        if _jwks is None and _jwks_prefetch is not None:
+            # Wait for the background fetch rather than starting a second one
+            await _jwks_prefetch
+        signing_key = find_signing_key(_jwks or await asyncio.to_thread(get_jwks), id_token)
+        if signing_key is None:
+            # Unknown kid: the keys may have rotated, so refetch once
+            signing_key = find_signing_key(await asyncio.to_thread(get_jwks, True), id_token)
+        if signing_key is None:
+            raise JWTError("ID token is signed with an unknown key")
+        claims = jwt.decode(
+            id_token,
+            signing_key,
+            algorithms=['RS256'],
+            audience=CLIENT_ID,
+            issuer=cognito_issuer(),
+            access_token=access_token
+        )
+        user_id = claims['cognito:username']
         
         return {
             "access_token": access_token,
@@ -79,7 +162,7 @@ async def login(request: LoginRequest):
         
     except cognito_client.exceptions.NotAuthorizedException:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-handler = Mangum(app)
\ No newline at end of file
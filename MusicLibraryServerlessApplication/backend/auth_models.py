@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+class RegisterRequest(BaseModel):
+    email: str
+    username: str
+    password: str
+
+class LoginRequest(BaseModel):
+    email: str
+    password: str
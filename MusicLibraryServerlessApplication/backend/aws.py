@@ -0,0 +1,15 @@
+import os
+import boto3
+from botocore.config import Config
+
+# Shared for the life of the Lambda execution environment so warm
+# invocations reuse pooled keep-alive connections
+SESSION = boto3.Session()
+CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    retries={'mode': 'adaptive'}
+)
+
+# Open connections during Lambda init instead of on the first request
+PREWARM_CONNECTIONS = os.environ.get('PREWARM_CONNECTIONS') == 'true'
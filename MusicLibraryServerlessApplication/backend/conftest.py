@@ -0,0 +1,10 @@
+import asyncio
+import pytest
+
+# One event loop serves every test in the session, so session-scoped async
+# fixtures outlive the tests of any single module
+@pytest.fixture(scope="session")
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
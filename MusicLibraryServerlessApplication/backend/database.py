@@ -1,15 +1,137 @@
-import boto3
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
-import uuid
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 from boto3.dynamodb.conditions import Key, Attr
+from uuid6 import uuid7
+from aws import SESSION, CONFIG
+
+# BatchGetItem accepts at most 100 keys and BatchWriteItem 25 requests
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_BATCH_RETRIES = 5
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _backoff(attempt: int):
+    # Exponential backoff for unprocessed batch items, capped at one second
+    time.sleep(min(0.05 * (2 ** attempt), 1.0))
+
+# Hot reads cached in process memory across warm invocations
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 10_000
+_SONG_CACHE: Dict[str, Tuple[float, Dict]] = {}
+_PLAYLISTS_CACHE: Dict[str, Tuple[float, List[Dict]]] = {}
+# Handlers read through worker threads, so cache writes are serialized
+_CACHE_LOCK = threading.Lock()
+
+def _cache_get(cache: Dict, key: str):
+    entry = cache.get(key)
+    if entry and time.monotonic() - entry[0] < CACHE_TTL_SECONDS:
+        return entry[1]
+    return None
+
+def _cache_put(cache: Dict, key: str, value):
+    with _CACHE_LOCK:
+        if key not in cache and len(cache) >= CACHE_MAX_ENTRIES:
+            # Evict the oldest entry; invalidations may remove it first
+            cache.pop(next(iter(cache)), None)
+        cache[key] = (time.monotonic(), value)
+
+# Song metadata copied onto collection and playlist rows so they can be
+# listed with a single query. Snapshots are not refreshed on song edits.
+SONG_SNAPSHOT_FIELDS = ('title', 'artist', 'album', 'year', 'genre', 'duration', 'cover_art_url')
+
+def _song_snapshot(song: Dict) -> Dict:
+    return {
+        field: song[field]
+        for field in SONG_SNAPSHOT_FIELDS
+        if song.get(field) is not None
+    }
+
+def _update_expression(updates: Dict) -> Dict:
+    # Placeholder names keep reserved words such as name, year and duration
+    # usable as attributes
+    fields = [(field, value) for field, value in updates.items() if value is not None]
+    return {
+        'UpdateExpression': 'SET ' + ', '.join(f'#k{i} = :v{i}' for i in range(len(fields))),
+        'ExpressionAttributeNames': {f'#k{i}': field for i, (field, _) in enumerate(fields)},
+        'ExpressionAttributeValues': {f':v{i}': value for i, (_, value) in enumerate(fields)}
+    }
+
+# Lowercased copies stored on write so searches can filter server-side.
+# They are internal and stripped from items handed back to callers.
+SEARCH_FIELDS = ('title', 'artist', 'album')
+SEARCH_ATTRIBUTES = tuple(f'{field}_lower' for field in SEARCH_FIELDS)
+
+def _search_attributes(song: Dict) -> Dict:
+    return {
+        f'{field}_lower': song[field].lower()
+        for field in SEARCH_FIELDS
+        if song.get(field)
+    }
+
+def _without_search_attributes(item: Dict) -> Dict:
+    return {key: value for key, value in item.items() if key not in SEARCH_ATTRIBUTES}
+
+def search_matcher(search: str):
+    # The search term is lowercased once per request; each song then costs a
+    # single substring scan over its searchable fields, joined with NUL so a
+    # match cannot span two fields. Stored lowercased copies are used when present.
+    needle = search.lower()
+
+    def matches(song: Dict) -> bool:
+        haystack = '\0'.join(
+            song.get(f'{field}_lower') or (song.get(field) or '').lower()
+            for field in SEARCH_FIELDS
+        )
+        return needle in haystack
+
+    return matches
+
+# boto3 sessions and resources are not thread-safe
+_RESOURCE_LOCK = threading.Lock()
+
+def _page_args(limit: Optional[int], start_key: Optional[Dict]) -> Dict:
+    args = {}
+    if limit:
+        args['Limit'] = limit
+    if start_key:
+        args['ExclusiveStartKey'] = start_key
+    return args
 
 class DynamoDBService:
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb')
         self.table_name = os.environ.get('TABLE_NAME')
-        self.table = self.dynamodb.Table(self.table_name)
+        self._local = threading.local()
+        # Build the resource for the importing thread up front
+        self.table
+
+    @property
+    def dynamodb(self):
+        # Each thread, including asyncio.to_thread workers, gets its own resource
+        resource = getattr(self._local, 'dynamodb', None)
+        if resource is None:
+            with _RESOURCE_LOCK:
+                resource = SESSION.resource('dynamodb', config=CONFIG)
+            self._local.dynamodb = resource
+        return resource
+
+    @property
+    def table(self):
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = self._local.table = self.dynamodb.Table(self.table_name)
+        return table
+
+    def warm(self):
+        # Best effort: resolves credentials and opens a pooled connection
+        try:
+            self.dynamodb.meta.client.describe_table(TableName=self.table_name)
+        except Exception:
+            pass
 
     def create_user(self, user_id: str, email: str, username: str) -> Dict:
         item = {
@@ -18,7 +140,7 @@ class DynamoDBService:
             'user_id': user_id,
             'email': email,
             'username': username,
-            'created_at': datetime.utcnow().isoformat(),
+            'created_at': _now(),
             'entity_type': 'user'
         }
         self.table.put_item(Item=item)
@@ -30,8 +152,8 @@ class DynamoDBService:
         )
         return response.get('Item')
 
-    def create_song(self, song_id: str, song_data: Dict) -> Dict:
-        item = {
+    def _song_item(self, song_id: str, song_data: Dict) -> Dict:
+        return {
             'PK': f'SONG#{song_id}',
             'SK': 'METADATA',
             'song_id': song_id,
@@ -40,74 +162,177 @@ class DynamoDBService:
             'GSI1SK': f'TITLE#{song_data["title"]}',
             'GSI2PK': f'GENRE#{song_data.get("genre", "Unknown")}',
             'GSI2SK': f'SONG#{song_id}',
-            **song_data
+            **song_data,
+            **_search_attributes(song_data)
         }
+
+    def create_song(self, song_id: str, song_data: Dict) -> Dict:
+        item = self._song_item(song_id, song_data)
         self.table.put_item(Item=item)
+        _SONG_CACHE.pop(song_id, None)
         return item
 
     def get_song(self, song_id: str) -> Optional[Dict]:
+        song = _cache_get(_SONG_CACHE, song_id)
+        if song is not None:
+            return song
+
         response = self.table.get_item(
             Key={'PK': f'SONG#{song_id}', 'SK': 'METADATA'}
         )
-        return response.get('Item')
+        song = response.get('Item')
+        if song is not None:
+            _cache_put(_SONG_CACHE, song_id, song)
+        return song
 
-    def add_song_to_user_collection(self, user_id: str, song_id: str, song_data: Dict) -> Dict:
-        # First create the song if it doesn't exist
-        existing_song = self.get_song(song_id)
-        if not existing_song:
-            self.create_song(song_id, song_data)
+    def _batch_request(self, operation, request_items: Dict, unprocessed_key: str):
+        # Yield each batch response, resubmitting unprocessed items with backoff
+        attempt = 0
+        while request_items:
+            response = operation(RequestItems=request_items)
+            yield response
+            request_items = response.get(unprocessed_key)
+            if request_items:
+                if attempt >= MAX_BATCH_RETRIES:
+                    raise Exception("Too many unprocessed items in batch request")
+                _backoff(attempt)
+                attempt += 1
+
+    def _query_pages(self, **query_args):
+        while True:
+            response = self.table.query(**query_args)
+            yield response
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def get_songs(self, song_ids: List[str]) -> Dict[str, Dict]:
+        # Fetch uncached song metadata in BatchGetItem chunks, keyed by song_id
+        songs = {}
+        unique_ids = []
+        for song_id in dict.fromkeys(song_ids):
+            song = _cache_get(_SONG_CACHE, song_id)
+            if song is not None:
+                songs[song_id] = song
+            else:
+                unique_ids.append(song_id)
+        for start in range(0, len(unique_ids), BATCH_GET_LIMIT):
+            keys = [
+                {'PK': f'SONG#{song_id}', 'SK': 'METADATA'}
+                for song_id in unique_ids[start:start + BATCH_GET_LIMIT]
+            ]
+            responses = self._batch_request(
+                self.dynamodb.batch_get_item,
+                {self.table_name: {'Keys': keys}},
+                'UnprocessedKeys'
+            )
+            for response in responses:
+                for item in response['Responses'].get(self.table_name, []):
+                    songs[item['song_id']] = item
+                    _cache_put(_SONG_CACHE, item['song_id'], item)
+        return songs
+
+    def _batch_delete(self, keys: List[Dict]):
+        for start in range(0, len(keys), BATCH_WRITE_LIMIT):
+            requests = [{'DeleteRequest': {'Key': key}} for key in keys[start:start + BATCH_WRITE_LIMIT]]
+            for _ in self._batch_request(
+                self.dynamodb.batch_write_item,
+                {self.table_name: requests},
+                'UnprocessedItems'
+            ):
+                pass
 
-        # Add to user's collection
+    def _with_song_details(self, items: List[Dict]) -> List[Dict]:
+        # Only rows written before song snapshots were stored need a lookup
+        missing = [item['song_id'] for item in items if 'title' not in item]
+        songs = self.get_songs(missing) if missing else {}
+        enriched = []
+        for item in items:
+            if 'title' in item:
+                enriched.append(_without_search_attributes(item))
+            elif item['song_id'] in songs:
+                enriched.append(_without_search_attributes({**songs[item['song_id']], **item}))
+        return enriched
+
+    def add_song_to_user_collection(self, user_id: str, song_id: str, song_data: Dict) -> Dict:
         item = {
             'PK': f'USER#{user_id}',
             'SK': f'SONG#{song_id}',
             'user_id': user_id,
             'song_id': song_id,
-            'added_at': datetime.utcnow().isoformat(),
+            'added_at': _now(),
             'rating': song_data.get('rating'),
             'notes': song_data.get('notes'),
             'play_count': 0,
-            'entity_type': 'user_song'
+            'entity_type': 'user_song',
+            **_song_snapshot(song_data),
+            **_search_attributes(song_data)
         }
-        self.table.put_item(Item=item)
-        return item
 
-    def get_user_songs(self, user_id: str) -> List[Dict]:
-        response = self.table.query(
-            KeyConditionExpression=Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('SONG#')
-        )
-        
-        # Get full song details for each user song
+        # Create the song if it doesn't exist and add it to the user's
+        # collection in a single transaction
+        client = self.dynamodb.meta.client
+        try:
+            client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': self.table_name,
+                    'Item': self._song_item(song_id, song_data),
+                    'ConditionExpression': 'attribute_not_exists(PK)'
+                }},
+                {'Put': {'TableName': self.table_name, 'Item': item}}
+            ])
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if reasons[:1] != ['ConditionalCheckFailed'] or any(code not in (None, 'None') for code in reasons[1:]):
+                raise
+            # The song already exists, only the collection entry is needed
+            self.table.put_item(Item=item)
+        return _without_search_attributes(item)
+
+    def get_user_songs(self, user_id: str, search: Optional[str] = None, limit: Optional[int] = None,
+                       start_key: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Dict]]:
+        # DynamoDB applies Limit to the rows it reads, before the filter, so
+        # searches read full pages and the matches are trimmed to limit below
+        query_args = {
+            'KeyConditionExpression': Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('SONG#'),
+            **_page_args(None if search else limit, start_key)
+        }
+        if search:
+            search_lower = search.lower()
+            query_args['FilterExpression'] = (
+                Attr('title_lower').contains(search_lower) |
+                Attr('artist_lower').contains(search_lower) |
+                Attr('album_lower').contains(search_lower) |
+                # Rows written before the lowercased copies existed are
+                # matched in Python once their song details are loaded
+                Attr('title_lower').not_exists()
+            )
+        # Keep reading until the page holds limit matches or the rows run out
         songs = []
-        for user_song in response['Items']:
-            song_id = user_song['song_id']
-            song_details = self.get_song(song_id)
-            if song_details:
-                combined = {**song_details, **user_song}
-                songs.append(combined)
+        for response in self._query_pages(**query_args):
+            page = self._with_song_details(response['Items'])
+            if search:
+                page = list(filter(search_matcher(search), page))
+            songs.extend(page)
+            last_key = response.get('LastEvaluatedKey')
+            if limit and len(songs) >= limit:
+                if len(songs) > limit:
+                    # Resume after the last song returned
+                    songs = songs[:limit]
+                    last_key = {'PK': songs[-1]['PK'], 'SK': songs[-1]['SK']}
+                break
         
-        return songs
+        return songs, last_key
 
     def update_user_song(self, user_id: str, song_id: str, updates: Dict) -> Dict:
         key = {'PK': f'USER#{user_id}', 'SK': f'SONG#{song_id}'}
-        
-        update_expression = "SET "
-        expression_values = {}
-        
-        for field, value in updates.items():
-            if value is not None:
-                update_expression += f"{field} = :{field}, "
-                expression_values[f":{field}"] = value
-        
-        update_expression = update_expression.rstrip(', ')
-        
-        self.table.update_item(
+        response = self.table.update_item(
             Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values
+            ReturnValues='ALL_NEW',
+            **_update_expression(updates)
         )
         
-        return self.table.get_item(Key=key)['Item']
+        return response['Attributes']
 
     def remove_song_from_user_collection(self, user_id: str, song_id: str):
         self.table.delete_item(
@@ -115,24 +340,30 @@ class DynamoDBService:
         )
 
     def create_playlist(self, user_id: str, playlist_data: Dict) -> Dict:
-        playlist_id = str(uuid.uuid4())
+        playlist_id = str(uuid7())
         item = {
             'PK': f'USER#{user_id}',
             'SK': f'PLAYLIST#{playlist_id}',
             'playlist_id': playlist_id,
             'user_id': user_id,
-            'created_at': datetime.utcnow().isoformat(),
+            'created_at': _now(),
             'entity_type': 'playlist',
             **playlist_data
         }
         self.table.put_item(Item=item)
+        _PLAYLISTS_CACHE.pop(user_id, None)
         return item
 
     def get_user_playlists(self, user_id: str) -> List[Dict]:
-        response = self.table.query(
-            KeyConditionExpression=Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('PLAYLIST#')
-        )
-        return response['Items']
+        playlists = _cache_get(_PLAYLISTS_CACHE, user_id)
+        if playlists is None:
+            response = self.table.query(
+                KeyConditionExpression=Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('PLAYLIST#')
+            )
+            playlists = response['Items']
+            _cache_put(_PLAYLISTS_CACHE, user_id, playlists)
+        # Callers annotate the returned items, so hand out copies
+        return [dict(playlist) for playlist in playlists]
 
     def get_playlist(self, user_id: str, playlist_id: str) -> Optional[Dict]:
         response = self.table.get_item(
@@ -142,47 +373,39 @@ class DynamoDBService:
 
     def update_playlist(self, user_id: str, playlist_id: str, updates: Dict) -> Dict:
         key = {'PK': f'USER#{user_id}', 'SK': f'PLAYLIST#{playlist_id}'}
-        
-        update_expression = "SET "
-        expression_values = {}
-        
-        for field, value in updates.items():
-            if value is not None:
-                update_expression += f"{field} = :{field}, "
-                expression_values[f":{field}"] = value
-        
-        update_expression = update_expression.rstrip(', ')
-        
-        self.table.update_item(
+        response = self.table.update_item(
             Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values
+            ReturnValues='ALL_NEW',
+            **_update_expression(updates)
         )
+        _PLAYLISTS_CACHE.pop(user_id, None)
         
-        return self.table.get_item(Key=key)['Item']
+        return response['Attributes']
 
     def delete_playlist(self, user_id: str, playlist_id: str):
-        # Delete playlist songs first
-        playlist_songs = self.get_playlist_songs(playlist_id)
-        for song in playlist_songs:
-            self.table.delete_item(
-                Key={'PK': f'PLAYLIST#{playlist_id}', 'SK': song['SK']}
-            )
-        
-        # Delete playlist
+        # Delete playlist songs in batches first. The playlist row goes last, in
+        # its own call, so a failed batch leaves the playlist there to retry.
+        pages = self._query_pages(
+            KeyConditionExpression=Key('PK').eq(f'PLAYLIST#{playlist_id}') & Key('SK').begins_with('SONG#'),
+            ProjectionExpression='PK, SK'
+        )
+        self._batch_delete([item for page in pages for item in page['Items']])
         self.table.delete_item(
             Key={'PK': f'USER#{user_id}', 'SK': f'PLAYLIST#{playlist_id}'}
         )
+        _PLAYLISTS_CACHE.pop(user_id, None)
 
     def add_song_to_playlist(self, playlist_id: str, song_id: str, position: int) -> Dict:
+        song = self.get_song(song_id) or {}
         item = {
             'PK': f'PLAYLIST#{playlist_id}',
             'SK': f'SONG#{song_id}#{position:04d}',
             'playlist_id': playlist_id,
             'song_id': song_id,
             'position': position,
-            'added_at': datetime.utcnow().isoformat(),
-            'entity_type': 'playlist_song'
+            'added_at': _now(),
+            'entity_type': 'playlist_song',
+            **_song_snapshot(song)
         }
         self.table.put_item(Item=item)
         return item
@@ -192,27 +415,30 @@ class DynamoDBService:
             KeyConditionExpression=Key('PK').eq(f'PLAYLIST#{playlist_id}') & Key('SK').begins_with('SONG#')
         )
         
-        # Get full song details
-        songs = []
-        for playlist_song in response['Items']:
-            song_id = playlist_song['song_id']
-            song_details = self.get_song(song_id)
-            if song_details:
-                combined = {**song_details, **playlist_song}
-                songs.append(combined)
-        
+        songs = self._with_song_details(response['Items'])
         return sorted(songs, key=lambda x: x['position'])
 
-    def search_songs_by_artist(self, artist: str) -> List[Dict]:
+    def count_playlist_songs(self, playlist_id: str) -> int:
+        pages = self._query_pages(
+            KeyConditionExpression=Key('PK').eq(f'PLAYLIST#{playlist_id}') & Key('SK').begins_with('SONG#'),
+            Select='COUNT'
+        )
+        return sum(page['Count'] for page in pages)
+
+    def search_songs_by_artist(self, artist: str, limit: Optional[int] = None,
+                              start_key: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Dict]]:
         response = self.table.query(
             IndexName='GSI1',
-            KeyConditionExpression=Key('GSI1PK').eq(f'ARTIST#{artist}')
+            KeyConditionExpression=Key('GSI1PK').eq(f'ARTIST#{artist}'),
+            **_page_args(limit, start_key)
         )
-        return response['Items']
+        return [_without_search_attributes(item) for item in response['Items']], response.get('LastEvaluatedKey')
 
-    def search_songs_by_genre(self, genre: str) -> List[Dict]:
+    def search_songs_by_genre(self, genre: str, limit: Optional[int] = None,
+                             start_key: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Dict]]:
         response = self.table.query(
             IndexName='GSI2',
-            KeyConditionExpression=Key('GSI2PK').eq(f'GENRE#{genre}')
+            KeyConditionExpression=Key('GSI2PK').eq(f'GENRE#{genre}'),
+            **_page_args(limit, start_key)
         )
-        return response['Items']
\ No newline at end of file
+        return [_without_search_attributes(item) for item in response['Items']], response.get('LastEvaluatedKey')
\ No newline at end of file
@@ -40,49 +40,3 @@ class PlaylistSong(BaseModel):
     song_id: str
     position: int
     added_at: datetime
-
-# Request/Response Models
-class RegisterRequest(BaseModel):
-    email: str
-    username: str
-    password: str
-
-class LoginRequest(BaseModel):
-    email: str
-    password: str
-
-class CreateSongRequest(BaseModel):
-    title: str
-    artist: str
-    album: Optional[str] = None
-    year: Optional[int] = None
-    genre: Optional[str] = None
-    duration: Optional[int] = None
-    cover_art_url: Optional[str] = None
-    rating: Optional[int] = Field(None, ge=1, le=5)
-    notes: Optional[str] = None
-
-class UpdateSongRequest(BaseModel):
-    title: Optional[str] = None
-    artist: Optional[str] = None
-    album: Optional[str] = None
-    year: Optional[int] = None
-    genre: Optional[str] = None
-    duration: Optional[int] = None
-    cover_art_url: Optional[str] = None
-    rating: Optional[int] = Field(None, ge=1, le=5)
-    notes: Optional[str] = None
-
-class CreatePlaylistRequest(BaseModel):
-    name: str
-    description: Optional[str] = None
-    is_public: bool = False
-
-class UpdatePlaylistRequest(BaseModel):
-    name: Optional[str] = None
-    description: Optional[str] = None
-    is_public: Optional[bool] = None
-
-class AddSongToPlaylistRequest(BaseModel):
-    song_id: str
-    position: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class CreatePlaylistRequest(BaseModel):
+    name: str
+    description: Optional[str] = None
+    is_public: bool = False
+
+class UpdatePlaylistRequest(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    is_public: Optional[bool] = None
+
+class AddSongToPlaylistRequest(BaseModel):
+    song_id: str
+    position: Optional[int] = None
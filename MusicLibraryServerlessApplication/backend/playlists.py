@@ -1,12 +1,14 @@
-import json
-import uuid
+import asyncio
 from fastapi import FastAPI, HTTPException, Path
-from mangum import Mangum
-from models import CreatePlaylistRequest, UpdatePlaylistRequest, AddSongToPlaylistRequest
+from fastapi.responses import ORJSONResponse
+from playlist_models import CreatePlaylistRequest, UpdatePlaylistRequest, AddSongToPlaylistRequest
 from database import DynamoDBService
+from aws import PREWARM_CONNECTIONS
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 db = DynamoDBService()
+if PREWARM_CONNECTIONS:
+    db.warm()
 
 def get_user_id_from_context(event_context=None):
     # In a real implementation, extract user_id from JWT token
@@ -19,10 +21,13 @@ async def get_playlists():
         user_id = get_user_id_from_context()
         playlists = db.get_user_playlists(user_id)
         
-        # Get song count for each playlist
-        for playlist in playlists:
-            playlist_songs = db.get_playlist_songs(playlist['playlist_id'])
-            playlist['song_count'] = len(playlist_songs)
+        # Get song count for each playlist concurrently
+        song_counts = await asyncio.gather(*[
+            asyncio.to_thread(db.count_playlist_songs, playlist['playlist_id'])
+            for playlist in playlists
+        ])
+        for playlist, song_count in zip(playlists, song_counts):
+            playlist['song_count'] = song_count
         
         return {"playlists": playlists}
         
@@ -34,11 +39,7 @@ async def create_playlist(request: CreatePlaylistRequest):
     try:
         user_id = get_user_id_from_context()
         
-        playlist_data = {
-            "name": request.name,
-            "description": request.description,
-            "is_public": request.is_public
-        }
+        playlist_data = request.model_dump()
         
         playlist = db.create_playlist(user_id, playlist_data)
         
@@ -52,15 +53,20 @@ async def get_playlist(playlist_id: str = Path(...)):
     try:
         user_id = get_user_id_from_context()
         
-        playlist = db.get_playlist(user_id, playlist_id)
+        # Fetch playlist metadata and songs concurrently
+        playlist, songs = await asyncio.gather(
+            asyncio.to_thread(db.get_playlist, user_id, playlist_id),
+            asyncio.to_thread(db.get_playlist_songs, playlist_id)
+        )
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        songs = db.get_playlist_songs(playlist_id)
         playlist['songs'] = songs
         
         return {"playlist": playlist}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,13 +75,7 @@ async def update_playlist(playlist_id: str, request: UpdatePlaylistRequest):
     try:
         user_id = get_user_id_from_context()
         
-        updates = {}
-        if request.name is not None:
-            updates['name'] = request.name
-        if request.description is not None:
-            updates['description'] = request.description
-        if request.is_public is not None:
-            updates['is_public'] = request.is_public
+        updates = request.model_dump(exclude_none=True)
         
         if not updates:
             raise HTTPException(status_code=400, detail="No updates provided")
@@ -84,6 +84,8 @@ async def update_playlist(playlist_id: str, request: UpdatePlaylistRequest):
         
         return {"message": "Playlist updated successfully", "playlist": updated_playlist}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -108,15 +110,14 @@ async def add_song_to_playlist(playlist_id: str, request: AddSongToPlaylistReque
         if not playlist:
             raise HTTPException(status_code=404, detail="Playlist not found")
         
-        # Get current songs to determine position
-        current_songs = db.get_playlist_songs(playlist_id)
-        position = request.position if request.position is not None else len(current_songs) + 1
+        # Count current songs to determine position
+        position = request.position if request.position is not None else db.count_playlist_songs(playlist_id) + 1
         
         playlist_song = db.add_song_to_playlist(playlist_id, request.song_id, position)
         
         return {"message": "Song added to playlist", "playlist_song": playlist_song}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-handler = Mangum(app)
\ No newline at end of file
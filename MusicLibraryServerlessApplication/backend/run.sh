@@ -0,0 +1,6 @@
+#!/bin/bash
+# Entrypoint for the Lambda Web Adapter: serves the FastAPI app named by
+# APP_MODULE (auth, songs or playlists) with a single uvicorn worker
+PATH=$PATH:$LAMBDA_TASK_ROOT/bin \
+    PYTHONPATH=$PYTHONPATH:/opt/python:$LAMBDA_RUNTIME_DIR \
+    exec python -m uvicorn --port=$PORT --workers 1 "$APP_MODULE:app"
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class CreateSongRequest(BaseModel):
+    title: str
+    artist: str
+    album: Optional[str] = None
+    year: Optional[int] = None
+    genre: Optional[str] = None
+    duration: Optional[int] = None
+    cover_art_url: Optional[str] = None
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    notes: Optional[str] = None
+
+class UpdateSongRequest(BaseModel):
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    year: Optional[int] = None
+    genre: Optional[str] = None
+    duration: Optional[int] = None
+    cover_art_url: Optional[str] = None
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    notes: Optional[str] = None
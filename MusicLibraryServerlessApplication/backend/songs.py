@@ -1,46 +1,65 @@
+import base64
 import json
-import uuid
-from fastapi import FastAPI, HTTPException, Depends, Query
-from mangum import Mangum
-from models import CreateSongRequest, UpdateSongRequest
-from database import DynamoDBService
-from typing import Optional, List
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from song_models import CreateSongRequest, UpdateSongRequest
+from database import DynamoDBService, search_matcher
+from aws import PREWARM_CONNECTIONS
+from typing import Dict, Optional
+from uuid6 import uuid7
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 db = DynamoDBService()
+if PREWARM_CONNECTIONS:
+    db.warm()
+
+USER_SONG_FIELDS = {'rating', 'notes'}
 
 def get_user_id_from_context(event_context=None):
     # In a real implementation, extract user_id from JWT token
     # For now, return a mock user_id
     return "mock-user-id"
 
+def encode_next_token(last_evaluated_key: Optional[Dict]) -> Optional[str]:
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+def decode_next_token(next_token: str) -> Dict:
+    start_key = json.loads(base64.urlsafe_b64decode(next_token.encode()))
+    if not isinstance(start_key, dict):
+        raise ValueError("next_token must encode an object")
+    return start_key
+
 @app.get("/songs")
 async def get_songs(
     artist: Optional[str] = Query(None),
     genre: Optional[str] = Query(None),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=100),
+    next_token: Optional[str] = Query(None)
 ):
+    try:
+        start_key = decode_next_token(next_token) if next_token else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid next_token")
+
     try:
         user_id = get_user_id_from_context()
         
         if artist:
-            songs = db.search_songs_by_artist(artist)
+            songs, last_key = db.search_songs_by_artist(artist, limit=limit, start_key=start_key)
         elif genre:
-            songs = db.search_songs_by_genre(genre)
+            songs, last_key = db.search_songs_by_genre(genre, limit=limit, start_key=start_key)
         else:
-            songs = db.get_user_songs(user_id)
+            # The search term is applied by DynamoDB for collection queries
+            songs, last_key = db.get_user_songs(user_id, search=search, limit=limit, start_key=start_key)
         
-        # Filter by search term if provided
-        if search:
-            search_lower = search.lower()
-            songs = [
-                song for song in songs
-                if search_lower in song.get('title', '').lower() or
-                   search_lower in song.get('artist', '').lower() or
-                   search_lower in song.get('album', '').lower()
-            ]
+        # Filter artist and genre results by search term if provided
+        if search and (artist or genre):
+            songs = list(filter(search_matcher(search), songs))
         
-        return {"songs": songs}
+        return {"songs": songs, "next_token": encode_next_token(last_key)}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,22 +68,10 @@ async def get_songs(
 async def create_song(request: CreateSongRequest):
     try:
         user_id = get_user_id_from_context()
-        song_id = str(uuid.uuid4())
-        
-        song_data = {
-            "title": request.title,
-            "artist": request.artist,
-            "album": request.album,
-            "year": request.year,
-            "genre": request.genre,
-            "duration": request.duration,
-            "cover_art_url": request.cover_art_url,
-            "rating": request.rating,
-            "notes": request.notes
-        }
+        song_id = str(uuid7())
         
-        # Remove None values
-        song_data = {k: v for k, v in song_data.items() if v is not None}
+        # Serialize without None values
+        song_data = request.model_dump(exclude_none=True)
         
         user_song = db.add_song_to_user_collection(user_id, song_id, song_data)
         
@@ -78,32 +85,11 @@ async def update_song(song_id: str, request: UpdateSongRequest):
     try:
         user_id = get_user_id_from_context()
         
-        # Update song metadata if provided
-        song_updates = {}
-        if request.title is not None:
-            song_updates['title'] = request.title
-        if request.artist is not None:
-            song_updates['artist'] = request.artist
-        if request.album is not None:
-            song_updates['album'] = request.album
-        if request.year is not None:
-            song_updates['year'] = request.year
-        if request.genre is not None:
-            song_updates['genre'] = request.genre
-        if request.duration is not None:
-            song_updates['duration'] = request.duration
-        if request.cover_art_url is not None:
-            song_updates['cover_art_url'] = request.cover_art_url
-        
-        # Update user-specific data
-        user_song_updates = {}
-        if request.rating is not None:
-            user_song_updates['rating'] = request.rating
-        if request.notes is not None:
-            user_song_updates['notes'] = request.notes
+        # Only user-specific data is stored per collection entry
+        user_song_updates = request.model_dump(include=USER_SONG_FIELDS, exclude_none=True)
         
         if user_song_updates:
-            updated_user_song = db.update_user_song(user_id, song_id, user_song_updates)
+            db.update_user_song(user_id, song_id, user_song_updates)
         
         return {"message": "Song updated successfully"}
         
@@ -120,5 +106,3 @@ async def delete_song(song_id: str):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-handler = Mangum(app)
\ No newline at end of file
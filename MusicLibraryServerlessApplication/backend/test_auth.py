@@ -0,0 +1,154 @@
+import asyncio
+import io
+import json
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from auth_models import LoginRequest
+
+USER_POOL_ID = 'us-east-1_testpool'
+CLIENT_ID = 'test-client-id'
+ISSUER = f'https://cognito-idp.us-east-1.amazonaws.com/{USER_POOL_ID}'
+
+class NotAuthorizedException(ClientError):
+    pass
+
+@pytest.fixture(scope="module")
+def auth_mod():
+    # Mock the database before importing auth module
+    with patch('database.DynamoDBService'):
+        import auth
+    return auth
+
+@pytest.fixture(scope="module")
+def signing_key():
+    # A locally generated RSA key stands in for the user pool's signing key
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = {**jwk.construct(public_pem, 'RS256').to_dict(), 'kid': 'key-1', 'use': 'sig'}
+    return private_pem, {'keys': [public_jwk]}
+
+@pytest.fixture
+def cognito_client(auth_mod):
+    client = MagicMock()
+    client.exceptions.NotAuthorizedException = NotAuthorizedException
+    with patch.object(auth_mod, 'USER_POOL_ID', USER_POOL_ID), \
+         patch.object(auth_mod, 'CLIENT_ID', CLIENT_ID), \
+         patch.object(auth_mod, '_cognito_client', client), \
+         patch.object(auth_mod, '_jwks', None):
+        yield client
+
+def id_token(signing_key, kid='key-1', **claims):
+    private_pem, _ = signing_key
+    claims = {
+        'aud': CLIENT_ID,
+        'iss': ISSUER,
+        'cognito:username': 'user-1',
+        'exp': int(time.time()) + 300,
+        **claims
+    }
+    return jwt.encode(claims, private_pem, algorithm='RS256', headers={'kid': kid})
+
+def authenticate(cognito_client, token):
+    cognito_client.admin_initiate_auth.return_value = {
+        'AuthenticationResult': {'AccessToken': 'access-token', 'IdToken': token}
+    }
+
+def jwks_response(jwks):
+    response = MagicMock()
+    response.__enter__.return_value = io.BytesIO(json.dumps(jwks).encode())
+    return response
+
+LOGIN = LoginRequest(email='user@example.com', password='Password1!')
+
+async def test_login_with_valid_token(auth_mod, cognito_client, signing_key):
+    token = id_token(signing_key)
+    authenticate(cognito_client, token)
+    
+    with patch('auth.urllib.request.urlopen', return_value=jwks_response(signing_key[1])) as urlopen:
+        result = await auth_mod.login(LOGIN)
+    
+    assert result == {
+        "access_token": "access-token",
+        "id_token": token,
+        "user_id": "user-1",
+        "token_type": "Bearer"
+    }
+    assert urlopen.call_args.args[0] == f'{ISSUER}/.well-known/jwks.json'
+
+async def test_login_rejects_wrong_audience(auth_mod, cognito_client, signing_key):
+    authenticate(cognito_client, id_token(signing_key, aud='another-client'))
+    
+    with patch('auth.urllib.request.urlopen', return_value=jwks_response(signing_key[1])):
+        with pytest.raises(auth_mod.HTTPException) as exc_info:
+            await auth_mod.login(LOGIN)
+    
+    assert exc_info.value.status_code == 401
+
+async def test_login_refetches_keys_for_unknown_kid(auth_mod, cognito_client, signing_key):
+    authenticate(cognito_client, id_token(signing_key))
+    stale_jwks = {'keys': [{**signing_key[1]['keys'][0], 'kid': 'rotated-out'}]}
+    
+    with patch('auth.urllib.request.urlopen', side_effect=[
+        jwks_response(stale_jwks),
+        jwks_response(signing_key[1])
+    ]) as urlopen:
+        result = await auth_mod.login(LOGIN)
+    
+    assert result["user_id"] == "user-1"
+    assert urlopen.call_count == 2
+
+async def test_login_rejects_kid_missing_after_refetch(auth_mod, cognito_client, signing_key):
+    authenticate(cognito_client, id_token(signing_key, kid='unknown'))
+    
+    with patch('auth.urllib.request.urlopen', side_effect=[
+        jwks_response(signing_key[1]),
+        jwks_response(signing_key[1])
+    ]) as urlopen:
+        with pytest.raises(auth_mod.HTTPException) as exc_info:
+            await auth_mod.login(LOGIN)
+    
+    assert exc_info.value.status_code == 401
+    assert urlopen.call_count == 2
+
+async def test_login_invalid_credentials(auth_mod, cognito_client):
+    cognito_client.admin_initiate_auth.side_effect = NotAuthorizedException(
+        {'Error': {'Code': 'NotAuthorizedException'}}, 'AdminInitiateAuth'
+    )
+    
+    with pytest.raises(auth_mod.HTTPException) as exc_info:
+        await auth_mod.login(LOGIN)
+    
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "Invalid credentials"
+
+async def test_login_waits_for_inflight_prefetch(auth_mod, cognito_client, signing_key):
+    authenticate(cognito_client, id_token(signing_key))
+    
+    with patch('auth.urllib.request.urlopen', return_value=jwks_response(signing_key[1])) as urlopen:
+        with patch.object(auth_mod, '_jwks_prefetch', asyncio.ensure_future(auth_mod.prefetch_jwks())):
+            result = await auth_mod.login(LOGIN)
+    
+    assert result["user_id"] == "user-1"
+    urlopen.assert_called_once()
+
+def test_warm_cognito_loads_signing_keys(auth_mod, cognito_client, signing_key):
+    with patch('auth.urllib.request.urlopen', return_value=jwks_response(signing_key[1])):
+        auth_mod.warm_cognito()
+    
+    assert auth_mod._jwks == signing_key[1]
+    cognito_client.describe_user_pool.assert_called_once_with(UserPoolId=USER_POOL_ID)
+
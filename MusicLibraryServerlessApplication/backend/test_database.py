@@ -0,0 +1,427 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+import database
+from database import DynamoDBService
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    database._SONG_CACHE.clear()
+    database._PLAYLISTS_CACHE.clear()
+
+@pytest.fixture
+def service():
+    # Kept patched so resources built on other threads are mocked too
+    with patch('database.SESSION'):
+        svc = DynamoDBService()
+        svc.table_name = 'test-table'
+        yield svc
+
+def batch_response(song_ids, unprocessed=None):
+    return {
+        'Responses': {'test-table': [{'song_id': song_id, 'title': f'Title {song_id}'} for song_id in song_ids]},
+        'UnprocessedKeys': unprocessed or {}
+    }
+
+class TransactionCanceledException(ClientError):
+    pass
+
+def transaction_cancelled(*codes):
+    return TransactionCanceledException(
+        {'Error': {'Code': 'TransactionCanceledException'},
+         'CancellationReasons': [{'Code': code} for code in codes]},
+        'TransactWriteItems'
+    )
+
+class TestGetSongs:
+    def test_get_songs_chunks_keys(self, service):
+        song_ids = [str(i) for i in range(150)]
+        service.dynamodb.batch_get_item.side_effect = [
+            batch_response(song_ids[:100]),
+            batch_response(song_ids[100:])
+        ]
+
+        songs = service.get_songs(song_ids)
+
+        assert len(songs) == 150
+        calls = service.dynamodb.batch_get_item.call_args_list
+        assert [len(c.kwargs['RequestItems']['test-table']['Keys']) for c in calls] == [100, 50]
+
+    def test_get_songs_deduplicates_keys(self, service):
+        service.dynamodb.batch_get_item.return_value = batch_response(['1'])
+
+        service.get_songs(['1', '1'])
+
+        keys = service.dynamodb.batch_get_item.call_args.kwargs['RequestItems']['test-table']['Keys']
+        assert keys == [{'PK': 'SONG#1', 'SK': 'METADATA'}]
+
+    def test_get_songs_retries_unprocessed_keys(self, service):
+        unprocessed = {'test-table': {'Keys': [{'PK': 'SONG#2', 'SK': 'METADATA'}]}}
+        service.dynamodb.batch_get_item.side_effect = [
+            batch_response(['1'], unprocessed),
+            batch_response(['2'])
+        ]
+
+        with patch('database.time.sleep') as mock_sleep:
+            songs = service.get_songs(['1', '2'])
+
+        assert set(songs) == {'1', '2'}
+        service.dynamodb.batch_get_item.assert_called_with(RequestItems=unprocessed)
+        mock_sleep.assert_called_once()
+
+    def test_get_songs_gives_up_after_max_retries(self, service):
+        unprocessed = {'test-table': {'Keys': [{'PK': 'SONG#1', 'SK': 'METADATA'}]}}
+        service.dynamodb.batch_get_item.return_value = batch_response([], unprocessed)
+
+        with patch('database.time.sleep'):
+            with pytest.raises(Exception):
+                service.get_songs(['1'])
+
+    def test_get_songs_only_fetches_uncached_songs(self, service):
+        service.dynamodb.batch_get_item.return_value = batch_response(['1'])
+        service.get_songs(['1'])
+        service.dynamodb.batch_get_item.return_value = batch_response(['2'])
+
+        songs = service.get_songs(['1', '2'])
+
+        assert set(songs) == {'1', '2'}
+        keys = service.dynamodb.batch_get_item.call_args.kwargs['RequestItems']['test-table']['Keys']
+        assert keys == [{'PK': 'SONG#2', 'SK': 'METADATA'}]
+
+class TestSongCache:
+    def test_get_song_is_cached(self, service):
+        service.table.get_item.return_value = {'Item': {'song_id': '1', 'title': 'T'}}
+
+        assert service.get_song('1') == service.get_song('1') == {'song_id': '1', 'title': 'T'}
+        service.table.get_item.assert_called_once()
+
+    def test_get_song_cache_expires(self, service):
+        service.table.get_item.return_value = {'Item': {'song_id': '1', 'title': 'T'}}
+
+        with patch('database.time.monotonic', side_effect=[0, database.CACHE_TTL_SECONDS + 1, database.CACHE_TTL_SECONDS + 1]):
+            service.get_song('1')
+            service.get_song('1')
+
+        assert service.table.get_item.call_count == 2
+
+    def test_missing_song_is_not_cached(self, service):
+        service.table.get_item.return_value = {}
+
+        assert service.get_song('1') is None
+        assert service.get_song('1') is None
+        assert service.table.get_item.call_count == 2
+
+class TestGetUserSongs:
+    def test_get_user_songs_merges_song_details(self, service):
+        service.table.query.return_value = {'Items': [
+            {'song_id': '1', 'rating': 5},
+            {'song_id': 'missing', 'rating': 3}
+        ]}
+        service.dynamodb.batch_get_item.return_value = batch_response(['1'])
+
+        songs, last_key = service.get_user_songs('user-1')
+
+        assert songs == [{'song_id': '1', 'title': 'Title 1', 'rating': 5}]
+        assert last_key is None
+        service.table.get_item.assert_not_called()
+
+    def test_get_user_songs_uses_song_snapshots(self, service):
+        items = [{'song_id': '1', 'title': 'Snapshot', 'artist': 'A', 'rating': 5}]
+        service.table.query.return_value = {'Items': items}
+
+        songs, _ = service.get_user_songs('user-1')
+
+        assert songs == items
+        service.dynamodb.batch_get_item.assert_not_called()
+
+    def test_get_user_songs_pages_results(self, service):
+        last_key = {'PK': 'USER#user-1', 'SK': 'SONG#1'}
+        service.table.query.return_value = {
+            'Items': [{'PK': 'USER#user-1', 'SK': 'SONG#1', 'song_id': '1', 'title': 'T'}],
+            'LastEvaluatedKey': last_key
+        }
+
+        songs, next_key = service.get_user_songs('user-1', limit=1, start_key={'PK': 'USER#user-1', 'SK': 'SONG#0'})
+
+        assert len(songs) == 1
+        assert next_key == last_key
+        kwargs = service.table.query.call_args.kwargs
+        assert kwargs['Limit'] == 1
+        assert kwargs['ExclusiveStartKey'] == {'PK': 'USER#user-1', 'SK': 'SONG#0'}
+
+    def test_get_user_songs_reads_on_until_limit_matches(self, service):
+        def row(i, title):
+            return {'PK': 'USER#user-1', 'SK': f'SONG#{i}', 'song_id': str(i), 'title': title, 'title_lower': title.lower()}
+        service.table.query.side_effect = [
+            {'Items': [], 'LastEvaluatedKey': {'PK': 'USER#user-1', 'SK': 'SONG#2'}},
+            {'Items': [row(3, 'Queen 1')], 'LastEvaluatedKey': {'PK': 'USER#user-1', 'SK': 'SONG#4'}},
+            {'Items': [row(5, 'Queen 2'), row(6, 'Queen 3')], 'LastEvaluatedKey': {'PK': 'USER#user-1', 'SK': 'SONG#6'}}
+        ]
+
+        songs, next_key = service.get_user_songs('user-1', search='queen', limit=2)
+
+        assert [song['song_id'] for song in songs] == ['3', '5']
+        # Resumes after the last song returned, not after the last row read
+        assert next_key == {'PK': 'USER#user-1', 'SK': 'SONG#5'}
+        assert service.table.query.call_count == 3
+        assert service.table.query.call_args.kwargs['ExclusiveStartKey'] == {'PK': 'USER#user-1', 'SK': 'SONG#4'}
+
+    def test_get_user_songs_search_reads_full_pages(self, service):
+        service.table.query.return_value = {'Items': []}
+
+        service.get_user_songs('user-1', search='queen', limit=50, start_key={'PK': 'USER#user-1', 'SK': 'SONG#0'})
+
+        kwargs = service.table.query.call_args.kwargs
+        assert 'Limit' not in kwargs
+        assert kwargs['ExclusiveStartKey'] == {'PK': 'USER#user-1', 'SK': 'SONG#0'}
+        service.table.query.assert_called_once()
+
+    def test_get_user_songs_stops_when_rows_run_out(self, service):
+        service.table.query.side_effect = [
+            {'Items': [], 'LastEvaluatedKey': {'PK': 'USER#user-1', 'SK': 'SONG#2'}},
+            {'Items': []}
+        ]
+
+        songs, next_key = service.get_user_songs('user-1', search='queen', limit=50)
+
+        assert songs == []
+        assert next_key is None
+
+    def test_get_user_songs_pushes_search_filter(self, service):
+        service.table.query.return_value = {'Items': []}
+
+        service.get_user_songs('user-1', search='Queen')
+
+        assert service.table.query.call_args.kwargs['FilterExpression'] == (
+            Attr('title_lower').contains('queen') |
+            Attr('artist_lower').contains('queen') |
+            Attr('album_lower').contains('queen') |
+            Attr('title_lower').not_exists()
+        )
+
+    def test_get_user_songs_matches_legacy_rows_in_python(self, service):
+        service.table.query.return_value = {'Items': [
+            {'song_id': '1', 'rating': 5},
+            {'song_id': '2', 'rating': 3},
+            {'song_id': '3', 'title': 'Queen Song', 'title_lower': 'queen song'}
+        ]}
+        service.dynamodb.batch_get_item.return_value = {'Responses': {'test-table': [
+            {'song_id': '1', 'title': 'Bohemian Rhapsody', 'artist': 'Queen'},
+            {'song_id': '2', 'title': 'Yesterday', 'artist': 'Beatles'}
+        ]}}
+
+        songs, _ = service.get_user_songs('user-1', search='queen')
+
+        assert [song['song_id'] for song in songs] == ['1', '3']
+
+    def test_get_user_songs_strips_search_attributes(self, service):
+        service.table.query.return_value = {'Items': [
+            {'song_id': '1', 'title': 'T', 'title_lower': 't', 'artist_lower': 'a'}
+        ]}
+
+        songs, _ = service.get_user_songs('user-1')
+
+        assert songs == [{'song_id': '1', 'title': 'T'}]
+
+    def test_get_user_songs_without_search_has_no_filter(self, service):
+        service.table.query.return_value = {'Items': []}
+
+        service.get_user_songs('user-1')
+
+        assert 'FilterExpression' not in service.table.query.call_args.kwargs
+
+class TestAddSongToUserCollection:
+    @pytest.fixture(autouse=True)
+    def client_exceptions(self, service):
+        service.dynamodb.meta.client.exceptions.TransactionCanceledException = TransactionCanceledException
+
+    def test_add_song_writes_song_and_user_song_in_one_transaction(self, service):
+        item = service.add_song_to_user_collection('user-1', 'song-1', {'title': 'T', 'artist': 'A', 'album': None, 'rating': 4})
+
+        transact_items = service.dynamodb.meta.client.transact_write_items.call_args.kwargs['TransactItems']
+        assert transact_items[0]['Put']['Item']['PK'] == 'SONG#song-1'
+        assert transact_items[0]['Put']['ConditionExpression'] == 'attribute_not_exists(PK)'
+        stored = transact_items[1]['Put']['Item']
+        assert item['rating'] == 4
+        assert item['title'] == 'T' and item['artist'] == 'A'
+        assert 'album' not in item
+        assert (stored['title_lower'], stored['artist_lower']) == ('t', 'a')
+        assert item == {k: v for k, v in stored.items() if not k.endswith('_lower')}
+        assert transact_items[0]['Put']['Item']['title_lower'] == 't'
+        service.table.get_item.assert_not_called()
+        service.table.put_item.assert_not_called()
+
+    def test_add_existing_song_only_writes_user_song(self, service):
+        service.dynamodb.meta.client.transact_write_items.side_effect = transaction_cancelled('ConditionalCheckFailed', 'None')
+
+        item = service.add_song_to_user_collection('user-1', 'song-1', {'title': 'T', 'artist': 'A'})
+
+        service.table.put_item.assert_called_once_with(Item={**item, 'title_lower': 't', 'artist_lower': 'a'})
+
+    def test_add_song_reraises_other_cancellations(self, service):
+        service.dynamodb.meta.client.transact_write_items.side_effect = transaction_cancelled('None', 'TransactionConflict')
+
+        with pytest.raises(TransactionCanceledException):
+            service.add_song_to_user_collection('user-1', 'song-1', {'title': 'T', 'artist': 'A'})
+
+class TestSearchSongs:
+    def test_search_songs_by_artist_strips_search_attributes(self, service):
+        service.table.query.return_value = {'Items': [{'song_id': '1', 'title': 'T', 'title_lower': 't'}]}
+
+        songs, _ = service.search_songs_by_artist('A')
+
+        assert songs == [{'song_id': '1', 'title': 'T'}]
+
+class TestAddSongToPlaylist:
+    def test_add_song_to_playlist_stores_song_snapshot(self, service):
+        service.table.get_item.return_value = {'Item': {
+            'PK': 'SONG#song-1', 'song_id': 'song-1', 'title': 'T', 'artist': 'A', 'duration': 180, 'notes': 'n'
+        }}
+
+        item = service.add_song_to_playlist('playlist-1', 'song-1', 1)
+
+        assert item['SK'] == 'SONG#song-1#0001'
+        assert (item['title'], item['artist'], item['duration']) == ('T', 'A', 180)
+        assert 'notes' not in item
+        service.table.put_item.assert_called_once_with(Item=item)
+
+class TestCountPlaylistSongs:
+    def test_count_playlist_songs_follows_pagination(self, service):
+        service.table.query.side_effect = [
+            {'Count': 3, 'LastEvaluatedKey': {'PK': 'PLAYLIST#p', 'SK': 'SONG#3#0003'}},
+            {'Count': 2}
+        ]
+
+        assert service.count_playlist_songs('p') == 5
+
+        first, second = service.table.query.call_args_list
+        assert first.kwargs['Select'] == 'COUNT'
+        assert second.kwargs['ExclusiveStartKey'] == {'PK': 'PLAYLIST#p', 'SK': 'SONG#3#0003'}
+
+class TestUpdateUserSong:
+    def test_update_user_song_returns_updated_item(self, service):
+        service.table.update_item.return_value = {'Attributes': {'song_id': 'song-1', 'rating': 4}}
+
+        result = service.update_user_song('user-1', 'song-1', {'rating': 4})
+
+        assert result == {'song_id': 'song-1', 'rating': 4}
+        assert service.table.update_item.call_args.kwargs['ReturnValues'] == 'ALL_NEW'
+        service.table.get_item.assert_not_called()
+
+class TestUpdatePlaylist:
+    def test_update_playlist_uses_attribute_name_placeholders(self, service):
+        service.table.update_item.return_value = {'Attributes': {'name': 'New', 'is_public': True}}
+
+        service.update_playlist('user-1', 'playlist-1', {'name': 'New', 'description': None, 'is_public': True})
+
+        kwargs = service.table.update_item.call_args.kwargs
+        assert kwargs['UpdateExpression'] == 'SET #k0 = :v0, #k1 = :v1'
+        assert kwargs['ExpressionAttributeNames'] == {'#k0': 'name', '#k1': 'is_public'}
+        assert kwargs['ExpressionAttributeValues'] == {':v0': 'New', ':v1': True}
+
+class TestDeletePlaylist:
+    def test_delete_playlist_batches_song_deletes(self, service):
+        song_keys = [{'PK': 'PLAYLIST#p', 'SK': f'SONG#{i}#{i:04d}'} for i in range(30)]
+        service.table.query.return_value = {'Items': song_keys}
+        service.dynamodb.batch_write_item.return_value = {'UnprocessedItems': {}}
+
+        service.delete_playlist('user-1', 'p')
+
+        calls = service.dynamodb.batch_write_item.call_args_list
+        requests = [r for c in calls for r in c.kwargs['RequestItems']['test-table']]
+        assert [len(c.kwargs['RequestItems']['test-table']) for c in calls] == [25, 5]
+        assert requests == [{'DeleteRequest': {'Key': key}} for key in song_keys]
+        assert service.table.query.call_args.kwargs['ProjectionExpression'] == 'PK, SK'
+        service.table.delete_item.assert_called_once_with(Key={'PK': 'USER#user-1', 'SK': 'PLAYLIST#p'})
+
+    def test_delete_playlist_retries_unprocessed_items(self, service):
+        song_key = {'PK': 'PLAYLIST#p', 'SK': 'SONG#1#0001'}
+        service.table.query.return_value = {'Items': [song_key]}
+        unprocessed = {'test-table': [{'DeleteRequest': {'Key': song_key}}]}
+        service.dynamodb.batch_write_item.side_effect = [
+            {'UnprocessedItems': unprocessed},
+            {'UnprocessedItems': {}}
+        ]
+
+        with patch('database.time.sleep'):
+            service.delete_playlist('user-1', 'p')
+
+        service.dynamodb.batch_write_item.assert_called_with(RequestItems=unprocessed)
+        service.table.delete_item.assert_called_once()
+
+    def test_delete_playlist_keeps_playlist_when_songs_fail(self, service):
+        song_key = {'PK': 'PLAYLIST#p', 'SK': 'SONG#1#0001'}
+        service.table.query.return_value = {'Items': [song_key]}
+        service.dynamodb.batch_write_item.return_value = {
+            'UnprocessedItems': {'test-table': [{'DeleteRequest': {'Key': song_key}}]}
+        }
+
+        with patch('database.time.sleep'):
+            with pytest.raises(Exception):
+                service.delete_playlist('user-1', 'p')
+
+        service.table.delete_item.assert_not_called()
+
+    def test_delete_empty_playlist_skips_batches(self, service):
+        service.table.query.return_value = {'Items': []}
+
+        service.delete_playlist('user-1', 'p')
+
+        service.dynamodb.batch_write_item.assert_not_called()
+        service.table.delete_item.assert_called_once_with(Key={'PK': 'USER#user-1', 'SK': 'PLAYLIST#p'})
+
+class TestPlaylistCache:
+    def test_get_user_playlists_is_cached_and_copied(self, service):
+        service.table.query.return_value = {'Items': [{'playlist_id': 'p'}]}
+
+        first = service.get_user_playlists('user-1')
+        first[0]['song_count'] = 3
+        second = service.get_user_playlists('user-1')
+
+        assert second == [{'playlist_id': 'p'}]
+        service.table.query.assert_called_once()
+
+    def test_create_playlist_invalidates_cache(self, service):
+        service.table.query.return_value = {'Items': []}
+        service.get_user_playlists('user-1')
+
+        service.create_playlist('user-1', {'name': 'New'})
+        service.get_user_playlists('user-1')
+
+        assert service.table.query.call_count == 2
+
+class TestThreading:
+    def test_each_thread_gets_its_own_resource(self):
+        with patch('database.SESSION') as session:
+            session.resource.side_effect = lambda *args, **kwargs: MagicMock()
+            svc = DynamoDBService()
+            tables = []
+            worker = threading.Thread(target=lambda: tables.append(svc.table))
+            worker.start()
+            worker.join()
+
+        assert tables[0] is not svc.table
+        assert svc.table is svc.table
+        assert session.resource.call_count == 2
+
+    def test_cache_evicts_oldest_entry(self):
+        with patch('database.CACHE_MAX_ENTRIES', 2):
+            database._cache_put(database._SONG_CACHE, '1', {})
+            database._cache_put(database._SONG_CACHE, '2', {})
+            database._cache_put(database._SONG_CACHE, '3', {})
+
+        assert list(database._SONG_CACHE) == ['2', '3']
+
+class TestWarm:
+    def test_warm_describes_table(self, service):
+        service.warm()
+
+        service.dynamodb.meta.client.describe_table.assert_called_once_with(TableName='test-table')
+
+    def test_warm_ignores_errors(self, service):
+        service.dynamodb.meta.client.describe_table.side_effect = Exception("AccessDenied")
+
+        service.warm()
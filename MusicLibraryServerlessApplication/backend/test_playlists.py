@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import patch
+
+@pytest.fixture(scope="module")
+def playlists_mod():
+    # Mock the database before importing playlists module
+    with patch('database.DynamoDBService'):
+        import playlists
+    return playlists
+
+@pytest.fixture
+def mock_db(playlists_mod):
+    with patch.object(playlists_mod, 'db') as mock:
+        yield mock
+
+async def test_get_playlists_adds_song_counts(playlists_mod, mock_db):
+    mock_db.get_user_playlists.return_value = [{'playlist_id': 'p1'}, {'playlist_id': 'p2'}]
+    mock_db.count_playlist_songs.side_effect = {'p1': 3, 'p2': 0}.get
+    
+    result = await playlists_mod.get_playlists()
+    
+    assert result == {"playlists": [
+        {'playlist_id': 'p1', 'song_count': 3},
+        {'playlist_id': 'p2', 'song_count': 0}
+    ]}
+    mock_db.get_user_playlists.assert_called_once_with('mock-user-id')
+
+async def test_get_playlists_without_playlists(playlists_mod, mock_db):
+    mock_db.get_user_playlists.return_value = []
+    
+    result = await playlists_mod.get_playlists()
+    
+    assert result == {"playlists": []}
+    mock_db.count_playlist_songs.assert_not_called()
+
+async def test_get_playlists_database_error(playlists_mod, mock_db):
+    mock_db.get_user_playlists.return_value = [{'playlist_id': 'p1'}]
+    mock_db.count_playlist_songs.side_effect = Exception("Database error")
+    
+    with pytest.raises(playlists_mod.HTTPException) as exc_info:
+        await playlists_mod.get_playlists()
+    
+    assert exc_info.value.status_code == 500
+    assert "Database error" in exc_info.value.detail
+
+async def test_get_playlist_includes_songs(playlists_mod, mock_db):
+    songs = [{'song_id': 's1', 'position': 1}]
+    mock_db.get_playlist.return_value = {'playlist_id': 'p1', 'name': 'Mix'}
+    mock_db.get_playlist_songs.return_value = songs
+    
+    result = await playlists_mod.get_playlist('p1')
+    
+    assert result == {"playlist": {'playlist_id': 'p1', 'name': 'Mix', 'songs': songs}}
+    mock_db.get_playlist.assert_called_once_with('mock-user-id', 'p1')
+    mock_db.get_playlist_songs.assert_called_once_with('p1')
+
+async def test_get_playlist_not_found(playlists_mod, mock_db):
+    mock_db.get_playlist.return_value = None
+    mock_db.get_playlist_songs.return_value = []
+    
+    with pytest.raises(playlists_mod.HTTPException) as exc_info:
+        await playlists_mod.get_playlist('missing')
+    
+    assert exc_info.value.status_code == 404
+
+async def test_update_playlist_without_updates(playlists_mod, mock_db):
+    with pytest.raises(playlists_mod.HTTPException) as exc_info:
+        await playlists_mod.update_playlist('p1', playlists_mod.UpdatePlaylistRequest())
+    
+    assert exc_info.value.status_code == 400
+    mock_db.update_playlist.assert_not_called()
+
+async def test_add_song_to_missing_playlist(playlists_mod, mock_db):
+    mock_db.get_playlist.return_value = None
+    
+    with pytest.raises(playlists_mod.HTTPException) as exc_info:
+        await playlists_mod.add_song_to_playlist('missing', playlists_mod.AddSongToPlaylistRequest(song_id='s1'))
+    
+    assert exc_info.value.status_code == 404
+    mock_db.add_song_to_playlist.assert_not_called()
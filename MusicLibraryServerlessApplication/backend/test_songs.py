@@ -1,267 +1,371 @@
+import httpx
+import itertools
+import orjson
 import pytest
-from unittest.mock import Mock, patch
-from fastapi.testclient import TestClient
-from fastapi import HTTPException
-import uuid
-
-# Mock the database before importing songs module
-with patch('database.DynamoDBService'):
-    from songs import app, get_user_id_from_context
-    from models import CreateSongRequest, UpdateSongRequest
-
-client = TestClient(app)
-
-@pytest.fixture
-def mock_db():
-    with patch('songs.db') as mock:
-        yield mock
-
-@pytest.fixture
-def mock_user_id():
-    with patch('songs.get_user_id_from_context', return_value='test-user-id') as mock:
-        yield mock
-
-class TestGetSongs:
-    def test_get_songs_success(self, mock_db, mock_user_id):
-        mock_songs = [
-            {'song_id': '1', 'title': 'Test Song', 'artist': 'Test Artist'},
-            {'song_id': '2', 'title': 'Another Song', 'artist': 'Another Artist'}
-        ]
-        mock_db.get_user_songs.return_value = mock_songs
-        
-        response = client.get("/songs")
-        
-        assert response.status_code == 200
-        assert response.json() == {"songs": mock_songs}
-        mock_db.get_user_songs.assert_called_once_with('test-user-id')
-
-    def test_get_songs_with_artist_filter(self, mock_db, mock_user_id):
-        mock_songs = [{'song_id': '1', 'title': 'Test Song', 'artist': 'Queen'}]
-        mock_db.search_songs_by_artist.return_value = mock_songs
-        
-        response = client.get("/songs?artist=Queen")
-        
-        assert response.status_code == 200
-        assert response.json() == {"songs": mock_songs}
-        mock_db.search_songs_by_artist.assert_called_once_with('Queen')
-
-    def test_get_songs_with_genre_filter(self, mock_db, mock_user_id):
-        mock_songs = [{'song_id': '1', 'title': 'Test Song', 'genre': 'Rock'}]
-        mock_db.search_songs_by_genre.return_value = mock_songs
-        
-        response = client.get("/songs?genre=Rock")
-        
-        assert response.status_code == 200
-        assert response.json() == {"songs": mock_songs}
-        mock_db.search_songs_by_genre.assert_called_once_with('Rock')
-
-    def test_get_songs_with_search_filter(self, mock_db, mock_user_id):
-        mock_songs = [
-            {'song_id': '1', 'title': 'Bohemian Rhapsody', 'artist': 'Queen', 'album': 'A Night at the Opera'},
-            {'song_id': '2', 'title': 'Another Song', 'artist': 'Test Artist', 'album': 'Test Album'}
-        ]
-        mock_db.get_user_songs.return_value = mock_songs
-        
-        response = client.get("/songs?search=bohemian")
-        
-        assert response.status_code == 200
-        result = response.json()
-        assert len(result["songs"]) == 1
-        assert result["songs"][0]["title"] == "Bohemian Rhapsody"
-
-    def test_get_songs_search_by_artist(self, mock_db, mock_user_id):
-        mock_songs = [
-            {'song_id': '1', 'title': 'Song 1', 'artist': 'Queen', 'album': 'Album 1'},
-            {'song_id': '2', 'title': 'Song 2', 'artist': 'Beatles', 'album': 'Album 2'}
-        ]
-        mock_db.get_user_songs.return_value = mock_songs
-        
-        response = client.get("/songs?search=queen")
-        
-        assert response.status_code == 200
-        result = response.json()
-        assert len(result["songs"]) == 1
-        assert result["songs"][0]["artist"] == "Queen"
-
-    def test_get_songs_database_error(self, mock_db, mock_user_id):
-        mock_db.get_user_songs.side_effect = Exception("Database error")
-        
-        response = client.get("/songs")
-        
-        assert response.status_code == 500
-        assert "Database error" in response.json()["detail"]
-
-class TestCreateSong:
-    def test_create_song_success(self, mock_db, mock_user_id):
-        mock_user_song = {
-            'user_id': 'test-user-id',
-            'song_id': 'test-song-id',
-            'title': 'Test Song',
-            'artist': 'Test Artist'
-        }
-        mock_db.add_song_to_user_collection.return_value = mock_user_song
-        
-        song_data = {
-            "title": "Test Song",
-            "artist": "Test Artist",
-            "album": "Test Album",
-            "year": 2023,
-            "genre": "Rock",
-            "duration": 180,
-            "rating": 5,
-            "notes": "Great song"
-        }
-        
-        with patch('songs.uuid.uuid4', return_value=Mock(hex='test-song-id')):
-            response = client.post("/songs", json=song_data)
-        
-        assert response.status_code == 200
-        result = response.json()
-        assert result["message"] == "Song added successfully"
-        assert result["song"] == mock_user_song
-
-    def test_create_song_minimal_data(self, mock_db, mock_user_id):
-        mock_user_song = {
-            'user_id': 'test-user-id',
-            'song_id': 'test-song-id',
-            'title': 'Test Song',
-            'artist': 'Test Artist'
-        }
-        mock_db.add_song_to_user_collection.return_value = mock_user_song
-        
-        song_data = {
-            "title": "Test Song",
-            "artist": "Test Artist"
-        }
-        
-        response = client.post("/songs", json=song_data)
-        
-        assert response.status_code == 200
-        result = response.json()
-        assert result["message"] == "Song added successfully"
-
-    def test_create_song_invalid_rating(self, mock_db, mock_user_id):
-        song_data = {
-            "title": "Test Song",
-            "artist": "Test Artist",
-            "rating": 6  # Invalid rating > 5
-        }
-        
-        response = client.post("/songs", json=song_data)
-        
-        assert response.status_code == 422  # Validation error
-
-    def test_create_song_missing_required_fields(self, mock_db, mock_user_id):
-        song_data = {
-            "title": "Test Song"
-            # Missing required 'artist' field
-        }
-        
-        response = client.post("/songs", json=song_data)
-        
-        assert response.status_code == 422  # Validation error
-
-    def test_create_song_database_error(self, mock_db, mock_user_id):
-        mock_db.add_song_to_user_collection.side_effect = Exception("Database error")
-        
-        song_data = {
-            "title": "Test Song",
-            "artist": "Test Artist"
-        }
-        
-        response = client.post("/songs", json=song_data)
-        
-        assert response.status_code == 500
-        assert "Database error" in response.json()["detail"]
-
-class TestUpdateSong:
-    def test_update_song_success(self, mock_db, mock_user_id):
-        mock_db.update_user_song.return_value = {'updated': True}
-        
-        update_data = {
-            "rating": 4,
-            "notes": "Updated notes"
-        }
-        
-        response = client.put("/songs/test-song-id", json=update_data)
-        
-        assert response.status_code == 200
-        assert response.json()["message"] == "Song updated successfully"
-        mock_db.update_user_song.assert_called_once_with(
-            'test-user-id', 
-            'test-song-id', 
-            {'rating': 4, 'notes': 'Updated notes'}
-        )
-
-    def test_update_song_partial_data(self, mock_db, mock_user_id):
-        mock_db.update_user_song.return_value = {'updated': True}
-        
-        update_data = {
-            "rating": 3
-        }
-        
-        response = client.put("/songs/test-song-id", json=update_data)
-        
-        assert response.status_code == 200
-        mock_db.update_user_song.assert_called_once_with(
-            'test-user-id', 
-            'test-song-id', 
-            {'rating': 3}
-        )
-
-    def test_update_song_no_user_updates(self, mock_db, mock_user_id):
-        update_data = {
-            "title": "New Title",
-            "artist": "New Artist"
-        }
-        
-        response = client.put("/songs/test-song-id", json=update_data)
-        
-        assert response.status_code == 200
-        # Should not call update_user_song since no user-specific fields
-        mock_db.update_user_song.assert_not_called()
-
-    def test_update_song_invalid_rating(self, mock_db, mock_user_id):
-        update_data = {
-            "rating": 0  # Invalid rating < 1
-        }
-        
-        response = client.put("/songs/test-song-id", json=update_data)
-        
-        assert response.status_code == 422  # Validation error
-
-    def test_update_song_database_error(self, mock_db, mock_user_id):
-        mock_db.update_user_song.side_effect = Exception("Database error")
-        
-        update_data = {
-            "rating": 4
-        }
-        
-        response = client.put("/songs/test-song-id", json=update_data)
-        
-        assert response.status_code == 500
-        assert "Database error" in response.json()["detail"]
-
-class TestDeleteSong:
-    def test_delete_song_success(self, mock_db, mock_user_id):
-        response = client.delete("/songs/test-song-id")
-        
-        assert response.status_code == 200
-        assert response.json()["message"] == "Song removed from collection"
-        mock_db.remove_song_from_user_collection.assert_called_once_with(
-            'test-user-id', 
-            'test-song-id'
-        )
-
-    def test_delete_song_database_error(self, mock_db, mock_user_id):
-        mock_db.remove_song_from_user_collection.side_effect = Exception("Database error")
-        
-        response = client.delete("/songs/test-song-id")
-        
-        assert response.status_code == 500
-        assert "Database error" in response.json()["detail"]
-
-class TestGetUserIdFromContext:
-    def test_get_user_id_returns_mock_id(self):
-        result = get_user_id_from_context()
-        assert result == "mock-user-id"
\ No newline at end of file
+import pytest_asyncio
+from unittest.mock import patch
+
+from song_models import CreateSongRequest, UpdateSongRequest
+
+# Keep this module on one xdist worker so it shares the session client and mocks
+pytestmark = pytest.mark.xdist_group("songs_mocked")
+
+# Request payloads are encoded once and sent as raw content
+JSON_HEADERS = {"content-type": "application/json"}
+_SONG_BASE = {"title": "Test Song", "artist": "Test Artist"}
+_BODIES = {
+    "create_full": orjson.dumps({
+        **_SONG_BASE,
+        "album": "Test Album",
+        "year": 2023,
+        "genre": "Rock",
+        "duration": 180,
+        "rating": 5,
+        "notes": "Great song"
+    }),
+    "create_invalid_rating": orjson.dumps({**_SONG_BASE, "rating": 6}),  # Invalid rating > 5
+    "create_missing_artist": orjson.dumps({"title": "Test Song"}),  # Missing required 'artist' field
+    "update_full": orjson.dumps({"rating": 4, "notes": "Updated notes"}),
+    "update_invalid_rating": orjson.dumps({"rating": 0})  # Invalid rating < 1
+}
+
+# Handler logic tests skip HTTP and call the endpoints with pre-built models
+_CREATE_MIN = CreateSongRequest(**_SONG_BASE)
+_UPDATE_PARTIAL = UpdateSongRequest(rating=3)
+_UPDATE_SONG_ONLY = UpdateSongRequest(title="New Title", artist="New Artist")
+
+# Fixed message responses are compared byte for byte
+EXPECTED_UPDATE = b'{"message":"Song updated successfully"}'
+EXPECTED_DELETE = b'{"message":"Song removed from collection"}'
+
+def body(response):
+    return orjson.loads(response.content)
+
+class _RecordingStub:
+    # Stands in for one DynamoDBService method and logs its calls
+    __slots__ = ('name', 'return_value', 'side_effect', '_calls')
+
+    def __init__(self, name, calls):
+        self.name = name
+        self._calls = calls
+        self.reset()
+
+    def reset(self):
+        self.return_value = None
+        self.side_effect = None
+
+    def __call__(self, *args, **kwargs):
+        self._calls.append((self.name, args, kwargs))
+        if self.side_effect is not None:
+            raise self.side_effect
+        return self.return_value
+
+    @property
+    def call_args_list(self):
+        return [(args, kwargs) for name, args, kwargs in self._calls if name == self.name]
+
+    @property
+    def call_args(self):
+        calls = self.call_args_list
+        return calls[-1] if calls else None
+
+    def assert_called_once_with(self, *args, **kwargs):
+        calls = self.call_args_list
+        assert calls == [(args, kwargs)], f"{self.name} calls: {calls}"
+
+    def assert_called_with(self, *args, **kwargs):
+        assert self.call_args == (args, kwargs), f"{self.name} last call: {self.call_args}"
+
+    def assert_not_called(self):
+        calls = self.call_args_list
+        assert not calls, f"{self.name} calls: {calls}"
+
+class FakeDB:
+    # Only the methods the songs handlers use; anything else is an AttributeError
+    METHODS = (
+        'get_user_songs',
+        'search_songs_by_artist',
+        'search_songs_by_genre',
+        'add_song_to_user_collection',
+        'update_user_song',
+        'remove_song_from_user_collection'
+    )
+    __slots__ = METHODS + ('_calls',)
+
+    def __init__(self):
+        self._calls = []
+        for name in self.METHODS:
+            setattr(self, name, _RecordingStub(name, self._calls))
+
+    def reset(self):
+        self._calls.clear()
+        for name in self.METHODS:
+            getattr(self, name).reset()
+
+    def configure_mock(self, **attrs):
+        # Same dotted keys as Mock.configure_mock, e.g. "get_user_songs.return_value"
+        for path, value in attrs.items():
+            name, attr = path.split('.')
+            setattr(getattr(self, name), attr, value)
+
+def setup_db(mock_db, **attrs):
+    mock_db.configure_mock(**attrs)
+
+# The app is imported on first use, so collection never pays for it
+@pytest.fixture(scope="session")
+def songs_mod():
+    # Mock the database before importing songs module
+    with patch('database.DynamoDBService'):
+        import songs
+    return songs
+
+@pytest.fixture(scope="session")
+def app(songs_mod):
+    return songs_mod.app
+
+@pytest_asyncio.fixture(scope="session")
+async def client(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+# Module attributes are swapped once per session and mocks reset between tests
+@pytest.fixture(scope="session")
+def _mock_db_session(songs_mod):
+    original = songs_mod.db
+    songs_mod.db = FakeDB()
+    yield songs_mod.db
+    songs_mod.db = original
+
+@pytest.fixture(scope="session", autouse=True)
+def _stub_user_id(songs_mod):
+    # Yields the real function for the test that covers it
+    original = songs_mod.get_user_id_from_context
+    songs_mod.get_user_id_from_context = lambda: 'test-user-id'
+    yield original
+    songs_mod.get_user_id_from_context = original
+
+# Song ids come from a counter instead of drawing random bytes per request
+@pytest.fixture(scope="session", autouse=True)
+def _stub_uuid(songs_mod):
+    counter = itertools.count()
+    original = songs_mod.uuid7
+    songs_mod.uuid7 = lambda: f"song-{next(counter)}"
+    yield
+    songs_mod.uuid7 = original
+
+@pytest.fixture(autouse=True)
+def mock_db(_mock_db_session):
+    _mock_db_session.reset()
+    return _mock_db_session
+
+# Sample rows are built once; handlers only read them
+@pytest.fixture(scope="session")
+def sample_songs():
+    return [
+        {'song_id': '1', 'title': 'Test Song', 'artist': 'Test Artist'},
+        {'song_id': '2', 'title': 'Another Song', 'artist': 'Another Artist'}
+    ]
+
+@pytest.fixture(scope="session")
+def sample_songs_for_search():
+    return [
+        {'song_id': '1', 'title': 'Bohemian Rhapsody', 'artist': 'Queen', 'album': 'A Night at the Opera'},
+        {'song_id': '2', 'title': 'Song 2', 'artist': 'Beatles', 'album': 'Album 2'}
+    ]
+
+async def test_get_songs_success(client, mock_db, sample_songs):
+    setup_db(mock_db, **{"get_user_songs.return_value": (sample_songs, None)})
+    
+    response = await client.get("/songs")
+    
+    assert response.status_code == 200
+    assert body(response) == {"songs": sample_songs, "next_token": None}
+    mock_db.get_user_songs.assert_called_once_with('test-user-id', search=None, limit=50, start_key=None)
+
+async def test_get_songs_with_artist_filter(client, mock_db):
+    mock_songs = [{'song_id': '1', 'title': 'Test Song', 'artist': 'Queen'}]
+    setup_db(mock_db, **{"search_songs_by_artist.return_value": (mock_songs, None)})
+    
+    response = await client.get("/songs?artist=Queen")
+    
+    assert response.status_code == 200
+    assert body(response) == {"songs": mock_songs, "next_token": None}
+    mock_db.search_songs_by_artist.assert_called_once_with('Queen', limit=50, start_key=None)
+
+async def test_get_songs_with_genre_filter(client, mock_db):
+    mock_songs = [{'song_id': '1', 'title': 'Test Song', 'genre': 'Rock'}]
+    setup_db(mock_db, **{"search_songs_by_genre.return_value": (mock_songs, None)})
+    
+    response = await client.get("/songs?genre=Rock")
+    
+    assert response.status_code == 200
+    assert body(response) == {"songs": mock_songs, "next_token": None}
+    mock_db.search_songs_by_genre.assert_called_once_with('Rock', limit=50, start_key=None)
+
+async def test_get_songs_with_search_filter(client, mock_db, sample_songs_for_search):
+    # DynamoDB applies the filter, so the rows come back untouched
+    setup_db(mock_db, **{"get_user_songs.return_value": (sample_songs_for_search, None)})
+    
+    response = await client.get("/songs?search=bohemian")
+    
+    assert response.status_code == 200
+    assert body(response) == {"songs": sample_songs_for_search, "next_token": None}
+    mock_db.get_user_songs.assert_called_once_with('test-user-id', search='bohemian', limit=50, start_key=None)
+
+async def test_get_songs_search_filters_genre_results(client, mock_db, sample_songs_for_search):
+    setup_db(mock_db, **{"search_songs_by_genre.return_value": (sample_songs_for_search, None)})
+    
+    response = await client.get("/songs?genre=Rock&search=queen")
+    
+    assert response.status_code == 200
+    result = body(response)
+    assert len(result["songs"]) == 1
+    assert result["songs"][0]["artist"] == "Queen"
+
+async def test_get_songs_search_skips_missing_fields(client, mock_db):
+    mock_songs = [
+        {'song_id': '1', 'title': 'Song 1', 'artist': 'Queen', 'album': None},
+        {'song_id': '2', 'title': 'Song 2', 'artist': 'Beatles'}
+    ]
+    setup_db(mock_db, **{"search_songs_by_genre.return_value": (mock_songs, None)})
+    
+    response = await client.get("/songs?genre=Rock&search=beatles")
+    
+    assert response.status_code == 200
+    assert [song["song_id"] for song in body(response)["songs"]] == ['2']
+
+async def test_get_songs_pagination(client, mock_db, songs_mod):
+    last_key = {'PK': 'USER#test-user-id', 'SK': 'SONG#1'}
+    setup_db(mock_db, **{"get_user_songs.return_value": ([{'song_id': '1'}], last_key)})
+    
+    response = await client.get("/songs?limit=1")
+    
+    assert response.status_code == 200
+    next_token = body(response)["next_token"]
+    assert songs_mod.decode_next_token(next_token) == last_key
+    
+    await client.get(f"/songs?limit=1&next_token={next_token}")
+    
+    mock_db.get_user_songs.assert_called_with('test-user-id', search=None, limit=1, start_key=last_key)
+
+async def test_get_songs_invalid_next_token(client, mock_db):
+    response = await client.get("/songs?next_token=not-a-token")
+    
+    assert response.status_code == 400
+    mock_db.get_user_songs.assert_not_called()
+
+async def test_get_songs_limit_out_of_range(client, mock_db):
+    response = await client.get("/songs?limit=500")
+    
+    assert response.status_code == 422
+
+async def test_create_song_success(client, mock_db):
+    mock_user_song = {
+        'user_id': 'test-user-id',
+        'song_id': 'test-song-id',
+        'title': 'Test Song',
+        'artist': 'Test Artist'
+    }
+    setup_db(mock_db, **{"add_song_to_user_collection.return_value": mock_user_song})
+    
+    response = await client.post("/songs", content=_BODIES["create_full"], headers=JSON_HEADERS)
+    
+    assert response.status_code == 200
+    result = body(response)
+    assert result["message"] == "Song added successfully"
+    assert result["song"] == mock_user_song
+    (user_id, song_id, song_data), _ = mock_db.add_song_to_user_collection.call_args
+    assert user_id == 'test-user-id'
+    assert song_id.startswith('song-')
+
+async def test_create_song_minimal_data(songs_mod, mock_db):
+    mock_user_song = {
+        'user_id': 'test-user-id',
+        'song_id': 'test-song-id',
+        'title': 'Test Song',
+        'artist': 'Test Artist'
+    }
+    setup_db(mock_db, **{"add_song_to_user_collection.return_value": mock_user_song})
+    
+    result = await songs_mod.create_song(_CREATE_MIN)
+    
+    assert result == {"message": "Song added successfully", "song": mock_user_song}
+    (user_id, song_id, song_data), _ = mock_db.add_song_to_user_collection.call_args
+    assert song_data == _SONG_BASE
+
+async def test_update_song_success(client, mock_db):
+    setup_db(mock_db, **{"update_user_song.return_value": {'updated': True}})
+    
+    response = await client.put("/songs/test-song-id", content=_BODIES["update_full"], headers=JSON_HEADERS)
+    
+    assert response.status_code == 200
+    assert response.content == EXPECTED_UPDATE
+    mock_db.update_user_song.assert_called_once_with(
+        'test-user-id', 
+        'test-song-id', 
+        {'rating': 4, 'notes': 'Updated notes'}
+    )
+
+async def test_update_song_partial_data(songs_mod, mock_db):
+    setup_db(mock_db, **{"update_user_song.return_value": {'updated': True}})
+    
+    await songs_mod.update_song('test-song-id', _UPDATE_PARTIAL)
+    
+    mock_db.update_user_song.assert_called_once_with(
+        'test-user-id', 
+        'test-song-id', 
+        {'rating': 3}
+    )
+
+async def test_update_song_no_user_updates(songs_mod, mock_db):
+    result = await songs_mod.update_song('test-song-id', _UPDATE_SONG_ONLY)
+    
+    assert result == {"message": "Song updated successfully"}
+    # Should not call update_user_song since no user-specific fields
+    mock_db.update_user_song.assert_not_called()
+
+async def test_delete_song_success(client, mock_db):
+    response = await client.delete("/songs/test-song-id")
+    
+    assert response.status_code == 200
+    assert response.content == EXPECTED_DELETE
+    mock_db.remove_song_from_user_collection.assert_called_once_with(
+        'test-user-id', 
+        'test-song-id'
+    )
+
+@pytest.mark.parametrize("method,url,body_name", [
+    ("POST", "/songs", "create_invalid_rating"),
+    ("POST", "/songs", "create_missing_artist"),
+    ("PUT", "/songs/test-song-id", "update_invalid_rating")
+])
+async def test_validation_error(client, mock_db, method, url, body_name):
+    response = await client.request(method, url, content=_BODIES[body_name], headers=JSON_HEADERS)
+    
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("db_attr,call", [
+    ("get_user_songs", lambda m: m.get_songs(artist=None, genre=None, search=None, limit=50, next_token=None)),
+    ("add_song_to_user_collection", lambda m: m.create_song(_CREATE_MIN)),
+    ("update_user_song", lambda m: m.update_song('test-song-id', _UPDATE_PARTIAL)),
+    ("remove_song_from_user_collection", lambda m: m.delete_song('test-song-id'))
+], ids=["get", "create", "update", "delete"])
+async def test_database_error(songs_mod, mock_db, db_attr, call):
+    setup_db(mock_db, **{f"{db_attr}.side_effect": Exception("Database error")})
+    
+    with pytest.raises(songs_mod.HTTPException) as exc_info:
+        await call(songs_mod)
+    
+    assert exc_info.value.status_code == 500
+    assert "Database error" in exc_info.value.detail
+
+def test_get_user_id_from_context_returns_mock(_stub_user_id):
+    get_user_id_from_context = _stub_user_id
+    assert get_user_id_from_context() == "mock-user-id"
+
+def test_app_encodes_responses_with_orjson(app):
+    from fastapi.responses import ORJSONResponse
+    
+    # The byte comparisons and orjson decoding above rely on this
+    assert app.router.default_response_class is ORJSONResponse
\ No newline at end of file
@@ -39,7 +39,8 @@ const Dashboard = () => {
           .slice(0, 5);
 
         setStats({
-          totalSongs: songs.length,
+          // Only the first page is loaded; a next_token means there are more
+          totalSongs: songsResponse.data.next_token ? `${songs.length}+` : songs.length,
           totalPlaylists: playlists.length,
           recentSongs
         });
@@ -40,7 +40,9 @@ const songValidationSchema = yup.object({
 
 const Songs = () => {
   const [songs, setSongs] = useState([]);
+  const [nextToken, setNextToken] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingSong, setEditingSong] = useState(null);
   const [error, setError] = useState('');
@@ -87,6 +89,7 @@ const Songs = () => {
     try {
       const response = await api.songs.getAll();
       setSongs(response.data.songs || []);
+      setNextToken(response.data.next_token || null);
     } catch (error) {
       setError('Failed to fetch songs');
     } finally {
@@ -94,6 +97,20 @@ const Songs = () => {
     }
   };
 
+  // The API returns one page at a time; further pages load on request
+  const loadMoreSongs = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await api.songs.getAll({ next_token: nextToken });
+      setSongs((current) => [...current, ...(response.data.songs || [])]);
+      setNextToken(response.data.next_token || null);
+    } catch (error) {
+      setError('Failed to fetch songs');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchSongs();
   }, []);
@@ -228,6 +245,14 @@ const Songs = () => {
         </Grid>
       )}
 
+      {nextToken && (
+        <Box display="flex" justifyContent="center" mt={3}>
+          <Button variant="outlined" onClick={loadMoreSongs} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load More'}
+          </Button>
+        </Box>
+      )}
+
       {/* Add/Edit Song Dialog */}
       <Dialog open={dialogOpen} onClose={() => setDialogOpen(false)} maxWidth="sm" fullWidth>
         <DialogTitle>